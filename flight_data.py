@@ -1,4 +1,5 @@
-import json
+import heapq
+import mmap
 import random
 import os
 from datetime import datetime, timedelta
@@ -6,7 +7,43 @@ import numpy as np
 from pathlib import Path
 import concurrent.futures
 import time
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple, Union
+
+import orjson
+
+# Flight files at least this large are memory-mapped instead of read
+MMAP_THRESHOLD = 1 << 20
+
+RECORD_FIELDS = (
+    "date",
+    "origin_city",
+    "destination_city",
+    "flight_duration_secs",
+    "passengers",
+)
+
+# Byte values bytes.isspace() treats as whitespace
+_WHITESPACE = frozenset(b" \t\n\r\x0b\x0c")
+
+REQUIRED_KEYS = frozenset(
+    {"origin_city", "destination_city", "flight_duration_secs", "passengers"}
+)
+
+_EMPTY_IDS = np.empty(0, dtype=np.int32)
+
+Buffer = Union[bytes, mmap.mmap]
+
+# (total, dirty, durations, dest_ids, flight_counts, duration_totals, arrived, left)
+Partial = Tuple[
+    int,
+    int,
+    np.ndarray,
+    np.ndarray,
+    np.ndarray,
+    np.ndarray,
+    np.ndarray,
+    np.ndarray,
+]
 
 
 class FlightDataProcessor:
@@ -18,55 +55,79 @@ class FlightDataProcessor:
         self.cities = [f"CITY_{i}" for i in range(self.num_cities)]
         self.null_prob = random.uniform(0.001, 0.005)
 
-    def generate_flight_record(self) -> dict:
-        """Generate a single flight record with possibility of NULL values"""
-        origin = random.choice(self.cities)
-        dest = random.choice([c for c in self.cities if c != origin])
-
-        record = {
-            "date": (datetime.now() + timedelta(days=random.randint(-30, 30))).strftime(
-                "%Y-%m-%d"
-            ),
-            "origin_city": origin,
-            "destination_city": dest,
-            "flight_duration_secs": random.randint(1800, 36000),
-            "passengers": random.randint(50, 400),
-        }
-
-        for key in record:
-            if random.random() < self.null_prob:
-                record[key] = None
-
-        return record
+        now = datetime.now()
+        self._month_year = now.strftime("%m-%Y")
+        # Every date a record can carry, indexed by day offset + 30
+        self._dates = [
+            (now + timedelta(days=offset)).strftime("%Y-%m-%d")
+            for offset in range(-30, 31)
+        ]
 
     def generate_file(self, file_idx: int) -> None:
-        """Generate a single JSON file with random flight records"""
+        """Generate a single NDJSON file with random flight records"""
         try:
-            num_records = random.randint(50, 100)
-            records = []
-
-            for _ in range(num_records):
-                record = self.generate_flight_record()
-
-                if (
-                    record["origin_city"] not in self.cities
-                    or record["destination_city"] not in self.cities
-                ):
-                    continue
-
-                records.append(record)
-
-            now = datetime.now()
-            month_year = now.strftime("%m-%Y")
-            origin_city = random.choice(self.cities)
+            # Draw every field for the whole file in one vectorized call each
+            rng = _rng
+            num_cities = self.num_cities
+            num_records = int(rng.integers(50, 101))
+            date_ids = rng.integers(0, len(self._dates), num_records)
+            origins = rng.integers(0, num_cities, num_records)
+            dests = (origins + rng.integers(1, num_cities, num_records)) % num_cities
+            durations = rng.integers(1800, 36001, num_records)
+            passengers = rng.integers(50, 401, num_records)
+
+            cities = self.cities
+            dates = self._dates
+            records = [
+                {
+                    "date": dates[day],
+                    "origin_city": cities[o],
+                    "destination_city": cities[d],
+                    "flight_duration_secs": dur,
+                    "passengers": pax,
+                }
+                for day, o, d, dur, pax in zip(
+                    date_ids.tolist(),
+                    origins.tolist(),
+                    dests.tolist(),
+                    durations.tolist(),
+                    passengers.tolist(),
+                )
+            ]
+
+            # Nulls are rare, so jump from one nulled field to the next with
+            # geometric gaps instead of drawing a uniform for every field
+            num_fields = len(RECORD_FIELDS)
+            dropped = set()
+            if self.null_prob > 0:
+                pos = int(rng.geometric(self.null_prob)) - 1
+                while pos < num_records * num_fields:
+                    idx, field = divmod(pos, num_fields)
+                    records[idx][RECORD_FIELDS[field]] = None
+                    if RECORD_FIELDS[field] in ("origin_city", "destination_city"):
+                        dropped.add(idx)
+                    pos += int(rng.geometric(self.null_prob))
+
+            # Records with a nulled origin or destination city are not written
+            if dropped:
+                records = [r for idx, r in enumerate(records) if idx not in dropped]
+
+            month_year = self._month_year
+            origin_city = cities[rng.integers(num_cities)]
 
             dir_path = Path(self.base_dir) / month_year
             dir_path.mkdir(parents=True, exist_ok=True)
 
-            file_path = dir_path / f"{month_year}-{origin_city}-{file_idx}-flights.json"
+            file_path = (
+                dir_path / f"{month_year}-{origin_city}-{file_idx}-flights.jsonl"
+            )
 
-            with open(file_path, "w") as f:
-                json.dump(records, f)
+            file_path.write_bytes(
+                b"".join(
+                    orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+                    for record in records
+                )
+            )
 
         except Exception as e:
             print(f"Error generating file {file_idx}: {str(e)}")
@@ -75,22 +136,27 @@ class FlightDataProcessor:
         """Generate all flight data files using parallel processing"""
         Path(self.base_dir).mkdir(parents=True, exist_ok=True)
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            list(executor.map(self.generate_file, range(self.num_files)))
+        with concurrent.futures.ProcessPoolExecutor(
+            initializer=_init_generator, initargs=(self,)
+        ) as executor:
+            list(executor.map(_generate_file, range(self.num_files), chunksize=32))
         print(f"Generating files in: {self.base_dir}")
 
-    def is_dirty_record(self, record: dict) -> bool:
+    @staticmethod
+    def is_dirty_record(record: dict) -> bool:
         """Check if a record contains any NULL values or is missing required keys"""
-        required_keys = [
-            "origin_city",
-            "destination_city",
-            "flight_duration_secs",
-            "passengers",
-        ]
-        for key in required_keys:
-            if key not in record or record[key] is None:
-                return True
-        return False
+        return None in map(record.get, REQUIRED_KEYS)
+
+    def _iter_data_files(self) -> Iterator[str]:
+        """Yield the paths of all flight files under the month directories"""
+        with os.scandir(self.base_dir) as month_dirs:
+            for month_dir in month_dirs:
+                if not month_dir.is_dir():
+                    continue
+                with os.scandir(month_dir.path) as entries:
+                    for entry in entries:
+                        if entry.name.endswith((".jsonl", ".json")) and entry.is_file():
+                            yield entry.path
 
     def analyze_data(self) -> Tuple[dict, float]:
         """Analyze the generated flight data"""
@@ -98,100 +164,243 @@ class FlightDataProcessor:
 
         total_records = 0
         dirty_records = 0
-        flight_durations = {}
-        city_passengers = {city: {"arrived": 0, "left": 0} for city in self.cities}
-
-        for root, _, files in os.walk(self.base_dir):
-            for file in files:
-                if not file.endswith(".json"):
-                    continue
-
-                try:
-                    with open(os.path.join(root, file), "r") as f:
-                        try:
-                            records = json.load(f)
-                        except json.JSONDecodeError as e:
-                            print(f"Error reading file {file}: {str(e)}")
-                            continue
-
-                    for record in records:
-                        total_records += 1
-
-                        if self.is_dirty_record(record):
-                            dirty_records += 1
-                            continue
-
-                        if "passengers" not in record or record["passengers"] is None:
-                            print(
-                                f"Skipping record in {file}: Missing or None 'passengers'"
-                            )
-                            dirty_records += 1
-                            continue
-
-                        dest = record.get("destination_city")
-                        if dest not in flight_durations:
-                            flight_durations[dest] = []
-
-                        if (
-                            "flight_duration_secs" in record
-                            and record["flight_duration_secs"] is not None
-                        ):
-                            flight_durations[dest].append(
-                                record["flight_duration_secs"]
-                            )
-
-                        passengers = record["passengers"]
-                        city_passengers[record["destination_city"]][
-                            "arrived"
-                        ] += passengers
-                        city_passengers[record["origin_city"]]["left"] += passengers
-
-                except Exception as e:
-                    print(f"Error processing file {file}: {str(e)}")
-                    continue
+        duration_parts = []
+        dest_id_parts = []
+        flight_counts = np.zeros(self.num_cities, dtype=np.int64)
+        duration_totals = np.zeros(self.num_cities, dtype=np.int64)
+        total_arrived = np.zeros(self.num_cities, dtype=np.int64)
+        total_left = np.zeros(self.num_cities, dtype=np.int64)
+
+        with concurrent.futures.ProcessPoolExecutor(
+            initializer=_init_analyzer, initargs=(self.cities,)
+        ) as executor:
+            for (
+                total,
+                dirty,
+                durations,
+                dest_ids,
+                counts,
+                totals,
+                arrived,
+                left,
+            ) in executor.map(_process_file, self._iter_data_files(), chunksize=64):
+                total_records += total
+                dirty_records += dirty
+                duration_parts.append(durations)
+                dest_id_parts.append(dest_ids)
+                flight_counts += counts
+                duration_totals += totals
+                total_arrived += arrived
+                total_left += left
+
+        durations = np.concatenate(duration_parts or [_EMPTY_IDS])
+        dest_ids = np.concatenate(dest_id_parts or [_EMPTY_IDS])
 
         stats = {
             "total_records": total_records,
             "dirty_records": dirty_records,
-            "duration_stats": self._calculate_duration_stats(flight_durations),
-            "passenger_stats": self._calculate_passenger_stats(city_passengers),
+            "duration_stats": self._calculate_duration_stats(
+                durations, dest_ids, flight_counts, duration_totals
+            ),
+            "passenger_stats": self._calculate_passenger_stats(
+                total_arrived, total_left
+            ),
         }
 
         run_duration = time.time() - start_time
         return stats, run_duration
 
-    def _calculate_duration_stats(self, flight_durations: Dict[str, List[int]]) -> dict:
+    def _calculate_duration_stats(
+        self,
+        durations: np.ndarray,
+        dest_ids: np.ndarray,
+        counts: np.ndarray,
+        totals: np.ndarray,
+    ) -> dict:
         """Calculate AVG and P95 for top 25 destination cities"""
+        flight_counts = counts.tolist()
+        top_city_ids = heapq.nlargest(
+            25, range(len(flight_counts)), key=flight_counts.__getitem__
+        )
+
         stats = {}
-        for city, durations in flight_durations.items():
-            if len(durations) > 0:
-                stats[city] = {
-                    "avg": float(np.mean(durations)),
-                    "p95": float(np.percentile(durations, 95)),
-                }
+        for city_id in top_city_ids:
+            if flight_counts[city_id] == 0:
+                break
+            stats[self.cities[city_id]] = {
+                "avg": float(totals[city_id] / counts[city_id]),
+                "p95": float(np.percentile(durations[dest_ids == city_id], 95)),
+            }
 
-        return dict(
-            sorted(
-                stats.items(), key=lambda x: len(flight_durations[x[0]]), reverse=True
-            )[:25]
-        )
+        return stats
 
-    def _calculate_passenger_stats(
-        self, city_passengers: Dict[str, Dict[str, int]]
-    ) -> dict:
+    def _calculate_passenger_stats(self, arrived: np.ndarray, left: np.ndarray) -> dict:
         """Find cities with max passengers arrived and left"""
-        max_arrived = max(city_passengers.items(), key=lambda x: x[1]["arrived"])
-        max_left = max(city_passengers.items(), key=lambda x: x[1]["left"])
+        max_arrived = int(arrived.argmax())
+        max_left = int(left.argmax())
 
+        # City ids are only mapped back to names for the final report
         return {
             "max_arrived": {
-                "city": max_arrived[0],
-                "passengers": max_arrived[1]["arrived"],
+                "city": self.cities[max_arrived],
+                "passengers": int(arrived[max_arrived]),
+            },
+            "max_left": {
+                "city": self.cities[max_left],
+                "passengers": int(left[max_left]),
             },
-            "max_left": {"city": max_left[0], "passengers": max_left[1]["left"]},
         }
 
 
+# Per-worker state installed by the pool initializers
+_generator = None
+_rng = np.random.default_rng()
+
+
+def _init_generator(processor: FlightDataProcessor) -> None:
+    """Install the processor in a generation worker so it is pickled only once"""
+    global _generator, _rng
+    _generator = processor
+    # Forked workers would otherwise share the parent's generator state
+    _rng = np.random.default_rng(os.getpid() ^ time.time_ns())
+
+
+def _generate_file(file_idx: int) -> None:
+    """Generate a single file using the worker's installed processor"""
+    _generator.generate_file(file_idx)
+
+
+_city_idx: Dict[str, int] = {}
+
+
+def _init_analyzer(cities: List[str]) -> None:
+    """Install the city -> id mapping in an analysis worker"""
+    global _city_idx
+    _city_idx = {city: i for i, city in enumerate(cities)}
+
+
+def _skip_whitespace(data: Buffer, start: int, end: int) -> int:
+    """Return the first index in data[start:end] that is not ASCII whitespace"""
+    while start < end and data[start] in _WHITESPACE:
+        start += 1
+    return start
+
+
+def _decode_records(data: Buffer) -> List[dict]:
+    """Decode the records of an NDJSON or legacy JSON array file
+
+    ``data`` is either the file's bytes or a memory map of it. Bytes are split
+    with C-level bytes methods; a mapped file is parsed through memoryview
+    slices so it is never copied.
+    """
+    if isinstance(data, bytes):
+        # Files written before the switch to NDJSON hold a single array
+        if data.lstrip()[:1] == b"[":
+            return orjson.loads(data)
+        return [orjson.loads(line) for line in data.splitlines() if line.strip()]
+
+    size = len(data)
+    with memoryview(data) as view:
+        start = _skip_whitespace(data, 0, size)
+        if data[start : start + 1] == b"[":
+            return orjson.loads(view)
+
+        records = []
+        while start < size:
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = size
+            stop = end
+            while stop > start and data[stop - 1] in _WHITESPACE:
+                stop -= 1
+            # Blank and whitespace-only lines are skipped, as on the bytes path
+            if stop > start:
+                records.append(orjson.loads(view[start:stop]))
+            start = _skip_whitespace(data, end + 1, size)
+        return records
+
+
+def _empty_partial() -> Partial:
+    """Partial aggregates for a file that could not be analyzed"""
+    zeros = np.zeros(len(_city_idx), dtype=np.int64)
+    return 0, 0, _EMPTY_IDS, _EMPTY_IDS, zeros, zeros, zeros, zeros
+
+
+def _process_file(path: str) -> Partial:
+    """Analyze a single flight file and return its partial aggregates"""
+    file = os.path.basename(path)
+
+    try:
+        # Small files take one unbuffered read; large ones are parsed straight
+        # from the page cache to skip copying them into a bytes object
+        with open(path, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    records = _decode_records(mm)
+            else:
+                records = _decode_records(f.read())
+
+    except orjson.JSONDecodeError as e:
+        print(f"Error reading file {file}: {str(e)}")
+        return _empty_partial()
+    except Exception as e:
+        print(f"Error processing file {file}: {str(e)}")
+        return _empty_partial()
+
+    # Transpose the records into per-field columns indexed by city id
+    total_records = len(records)
+    dirty_records = 0
+    origin_ids = np.empty(total_records, dtype=np.int32)
+    dest_ids = np.empty(total_records, dtype=np.int32)
+    durations = np.empty(total_records, dtype=np.int32)
+    passengers = np.empty(total_records, dtype=np.int32)
+    clean = np.zeros(total_records, dtype=bool)
+
+    try:
+        for i, record in enumerate(records):
+            # Inlined is_dirty_record: a missing key also maps to None
+            if None in map(record.get, REQUIRED_KEYS):
+                dirty_records += 1
+                continue
+
+            origin_ids[i] = _city_idx[record["origin_city"]]
+            dest_ids[i] = _city_idx[record["destination_city"]]
+            durations[i] = record["flight_duration_secs"]
+            passengers[i] = record["passengers"]
+            clean[i] = True
+
+    except Exception as e:
+        # Keep what was tallied up to and including the bad record, as the
+        # sequential reader did; later records in the file are not counted
+        print(f"Error processing file {file}: {str(e)}")
+        total_records = i + 1
+
+    origin_ids = origin_ids[clean]
+    dest_ids = dest_ids[clean]
+    durations = durations[clean]
+    passengers = passengers[clean]
+    # Per-city counts and sums merge exactly across workers, so the mean never
+    # needs the raw durations; those are only kept for the exact P95
+    num_cities = len(_city_idx)
+    counts = np.bincount(dest_ids, minlength=num_cities)
+    totals = np.bincount(dest_ids, weights=durations, minlength=num_cities)
+    arrived = np.bincount(dest_ids, weights=passengers, minlength=num_cities)
+    left = np.bincount(origin_ids, weights=passengers, minlength=num_cities)
+
+    return (
+        total_records,
+        dirty_records,
+        durations,
+        dest_ids,
+        counts.astype(np.int64),
+        totals.astype(np.int64),
+        arrived.astype(np.int64),
+        left.astype(np.int64),
+    )
+
+
 def main():
     processor = FlightDataProcessor()
 
@@ -0,0 +1,106 @@
+import numpy as np
+import orjson
+import pytest
+
+import flight_data
+
+RECORDS = [
+    {
+        "date": "2024-01-01",
+        "origin_city": "CITY_0",
+        "destination_city": "CITY_1",
+        "flight_duration_secs": 3600,
+        "passengers": 120,
+    },
+    {
+        "date": "2024-01-02",
+        "origin_city": "CITY_1",
+        "destination_city": "CITY_0",
+        "flight_duration_secs": None,
+        "passengers": 80,
+    },
+]
+
+NDJSON = b"\n".join(orjson.dumps(record) for record in RECORDS)
+
+CONTENTS = {
+    "ndjson": NDJSON + b"\n",
+    "whitespace_lines": b"\n  \n" + NDJSON.replace(b"\n", b"\r\n  \n\t") + b"\n \r\n",
+    "legacy_array": orjson.dumps(RECORDS),
+    "legacy_array_leading_whitespace": b" \n\t" + orjson.dumps(RECORDS) + b"\n",
+}
+
+
+@pytest.fixture(autouse=True)
+def city_index():
+    flight_data._init_analyzer(["CITY_0", "CITY_1"])
+
+
+@pytest.mark.parametrize("content", CONTENTS.values(), ids=CONTENTS.keys())
+def test_read_and_mmap_paths_agree(tmp_path, monkeypatch, content):
+    path = tmp_path / "flights.jsonl"
+    path.write_bytes(content)
+
+    monkeypatch.setattr(flight_data, "MMAP_THRESHOLD", len(content) + 1)
+    read = flight_data._process_file(str(path))
+    monkeypatch.setattr(flight_data, "MMAP_THRESHOLD", 1)
+    mapped = flight_data._process_file(str(path))
+
+    assert read[:2] == mapped[:2] == (2, 1)
+    for read_part, mapped_part in zip(read[2:], mapped[2:]):
+        assert read_part.tolist() == mapped_part.tolist()
+
+
+@pytest.mark.parametrize("content", CONTENTS.values(), ids=CONTENTS.keys())
+def test_decode_records(content):
+    assert flight_data._decode_records(content) == RECORDS
+
+
+def test_bad_record_keeps_counts_tallied_before_it(tmp_path):
+    unknown_city = dict(RECORDS[0], destination_city="CITY_9")
+    path = tmp_path / "flights.jsonl"
+    path.write_bytes(
+        NDJSON + b"\n" + orjson.dumps(unknown_city) + b"\n" + orjson.dumps(RECORDS[0])
+    )
+
+    total, dirty, durations, dest_ids, *_ = flight_data._process_file(str(path))
+
+    assert (total, dirty) == (3, 1)
+    assert durations.tolist() == [3600]
+    assert dest_ids.tolist() == [1]
+
+
+def generate_records(tmp_path, monkeypatch, null_prob, num_files=40):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(flight_data, "_rng", np.random.default_rng(0))
+    processor = flight_data.FlightDataProcessor()
+    processor.null_prob = null_prob
+    for file_idx in range(num_files):
+        processor.generate_file(file_idx)
+
+    paths = sorted(processor.base_dir.glob("*/*.jsonl"))
+    assert len(paths) == num_files
+    return [
+        orjson.loads(line) for path in paths for line in path.read_bytes().splitlines()
+    ]
+
+
+def test_generate_without_nulls(tmp_path, monkeypatch):
+    records = generate_records(tmp_path, monkeypatch, null_prob=0)
+
+    assert len(records) >= 40 * 50
+    assert all(None not in record.values() for record in records)
+
+
+def test_generate_with_nulls(tmp_path, monkeypatch):
+    null_prob = 0.3
+    records = generate_records(tmp_path, monkeypatch, null_prob)
+
+    # Rows with a nulled city are dropped, which keeps about (1 - p)^2 of them
+    assert all(record["origin_city"] is not None for record in records)
+    assert all(record["destination_city"] is not None for record in records)
+    assert len(records) / (40 * 75) == pytest.approx((1 - null_prob) ** 2, abs=0.05)
+
+    for field in ("date", "flight_duration_secs", "passengers"):
+        nulled = sum(record[field] is None for record in records)
+        assert nulled / len(records) == pytest.approx(null_prob, abs=0.05)